@@ -1,53 +1,93 @@
-import github3
-import csv
-import os
+import hashlib
+import orjson
+import pandas as pd
+import re
+import requests
 from getpass import getpass
 from typing import List, Dict
-from pathlib import Path
-from dotenv import load_dotenv
 from tqdm import tqdm
-
-
-def get_github_token() -> str:
+from _common import (
+    clear_later_stages,
+    get_data_path,
+    get_github_token,
+    get_repos_hash_path,
+    read_repos_hash,
+    save_repos,
+)
+
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Only the fields written to the CSV are requested, 100 repos per page.
+# "sketch" tells us whether img/sketch.png exists without fetching it.
+REPOS_QUERY = """
+query($org: String!, $cursor: String) {
+  organization(login: $org) {
+    repositories(first: 100, after: $cursor) {
+      nodes {
+        name
+        nameWithOwner
+        url
+        description
+        homepageUrl
+        createdAt
+        updatedAt
+        pushedAt
+        isPrivate
+        defaultBranchRef {
+          name
+          target {
+            oid
+          }
+        }
+        sketch: object(expression: "HEAD:img/sketch.png") {
+          ... on Blob {
+            oid
+            byteSize
+          }
+        }
+      }
+      pageInfo {
+        endCursor
+        hasNextPage
+      }
+    }
+  }
+}
+"""
+
+
+def run_graphql_query(
+    session: requests.Session, query: str, variables: Dict
+) -> Dict:
     """
-    Get GitHub Personal Access Token.
+    Run a query against the GitHub GraphQL API.
 
-    Checks in order:
-    1. Environment variables (GITHUB_TOKEN or GITHUB_PAT)
-    2. .env file (GITHUB_TOKEN or GITHUB_PAT)
-    3. Prompts user for input
+    Args:
+        session: Session with the Authorization header set
+        query: GraphQL query string
+        variables: Query variables
 
     Returns:
-        GitHub Personal Access Token
-    """
-    # Check environment variables first (for CI/CD)
-    token = os.getenv("GITHUB_TOKEN", "").strip()
-
-    # If not found, check GITHUB_PAT
-    if not token:
-        token = os.getenv("GITHUB_PAT", "").strip()
+        The "data" member of the response
 
-    # If still not found, load from .env file
-    if not token:
-        load_dotenv()
-        token = os.getenv("GITHUB_TOKEN", "").strip()
-
-    # If still not found, check GITHUB_PAT from .env
-    if not token:
-        token = os.getenv("GITHUB_PAT", "").strip()
-
-    # Finally, prompt user if still empty
-    if not token:
-        token = getpass(
-            "Enter your GitHub Personal Access Token (press Enter to skip): "
-        ).strip()
+    Raises:
+        requests.HTTPError: If the request fails (e.g. 401 for a bad token)
+        RuntimeError: If the query returns GraphQL errors
+    """
+    response = session.post(
+        GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        timeout=30,
+    )
+    response.raise_for_status()
+    payload = orjson.loads(response.content)
 
-    if not token:
-        raise ValueError(
-            "No GitHub token provided. Please provide a token via environment variable, .env file, or prompt."
-        )
+    if payload.get("errors"):
+        messages = "; ".join(e.get("message", "") for e in payload["errors"])
+        raise RuntimeError(f"GitHub GraphQL query failed: {messages}")
 
-    return token
+    return payload["data"]
 
 
 def fetch_ubc_mds_repos(
@@ -56,6 +96,9 @@ def fetch_ubc_mds_repos(
     """
     Fetch all repositories from UBC-MDS organization that match the given pattern.
 
+    Uses the GitHub GraphQL API so each page of 100 repositories is a single
+    request containing only the fields we need.
+
     Args:
         pattern: The prefix pattern to match repository names against
         token: GitHub Personal Access Token
@@ -65,69 +108,97 @@ def fetch_ubc_mds_repos(
     """
     org_name = "UBC-MDS"
 
-    # Create GitHub client with token
-    try:
-        gh = github3.login(token=token)
-        org = gh.organization(org_name)
-    except github3.exceptions.AuthenticationFailed:
-        print("\nAuthentication failed with provided token.")
-        token = getpass(
-            "Please manually paste your GitHub Personal Access Token: "
-        ).strip()
-        if not token:
-            raise ValueError(
-                "No token provided. Cannot authenticate with GitHub."
-            )
-        gh = github3.login(token=token)
-        org = gh.organization(org_name)
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
 
     matching_repos = []
-
-    # Iterate through all repos (github3 handles pagination automatically)
-    with tqdm(desc="Scanning repos (0 matches)", unit=" repos") as pbar:
-        for repo in org.repositories():
+    cursor = None
+    prefix_match = re.compile(re.escape(pattern)).match
+
+    # GraphQL doesn't support filtering by name prefix, so filter client-side
+    with tqdm(desc="Scanning repos (0 matches)", unit=" pages") as pbar:
+        while True:
+            variables = {"org": org_name, "cursor": cursor}
+            try:
+                data = run_graphql_query(session, REPOS_QUERY, variables)
+            except requests.HTTPError as e:
+                if e.response.status_code != 401 or cursor is not None:
+                    raise
+                print("\nAuthentication failed with provided token.")
+                token = getpass(
+                    "Please manually paste your GitHub Personal Access Token: "
+                ).strip()
+                if not token:
+                    raise ValueError(
+                        "No token provided. Cannot authenticate with GitHub."
+                    )
+                session.headers["Authorization"] = f"Bearer {token}"
+                data = run_graphql_query(session, REPOS_QUERY, variables)
+
+            repositories = data["organization"]["repositories"]
             pbar.update(1)
-            if repo.name.startswith(pattern):
-                matching_repos.append({
-                    "name": repo.name,
-                    "full_name": repo.full_name,
-                    "html_url": repo.html_url,
-                    "description": repo.description or "",
-                    "created_at": repo.created_at if repo.created_at else "",
-                    "updated_at": repo.updated_at if repo.updated_at else "",
-                    "private": repo.private,
-                })
-                # Update progress bar description with match count
-                pbar.set_description(
-                    f"Scanning repos ({len(matching_repos)} matches)"
-                )
+
+            for repo in repositories["nodes"]:
+                if prefix_match(repo["name"]):
+                    default_branch = repo["defaultBranchRef"] or {}
+                    # Null if img/sketch.png doesn't exist on the default branch
+                    sketch = repo["sketch"] or {}
+                    matching_repos.append({
+                        "name": repo["name"],
+                        "full_name": repo["nameWithOwner"],
+                        "html_url": repo["url"],
+                        "description": repo["description"] or "",
+                        "website_url": repo["homepageUrl"] or "",
+                        "created_at": repo["createdAt"] or "",
+                        "updated_at": repo["updatedAt"] or "",
+                        "pushed_at": repo["pushedAt"] or "",
+                        "private": repo["isPrivate"],
+                        "default_branch": default_branch.get("name", ""),
+                        "default_branch_sha": (
+                            default_branch.get("target") or {}
+                        ).get("oid", ""),
+                        "sketch_oid": sketch.get("oid", ""),
+                        "sketch_size": sketch.get("byteSize", 0),
+                    })
+
+            # Update progress bar description with match count
+            pbar.set_description(
+                f"Scanning repos ({len(matching_repos)} matches)"
+            )
+
+            page_info = repositories["pageInfo"]
+            if not page_info["hasNextPage"]:
+                break
+            cursor = page_info["endCursor"]
 
     return matching_repos
 
 
-def get_output_path() -> Path:
+def hash_repos(repos: List[Dict]) -> str:
     """
-    Get the output path for the CSV file.
+    Compute a digest of the repository list.
+
+    pushed_at is included so that a push to any repo (e.g. adding a demo)
+    makes the later scripts run again.
 
-    Works in both script and interactive modes by checking if __file__ is defined.
-    If running interactively, defaults to current working directory.
+    Args:
+        repos: List of repository dictionaries
 
     Returns:
-        Path to the data directory
+        Hex digest, independent of the order repos were returned in
     """
-    try:
-        # Running as a script
-        script_dir = Path(__file__).parent
-        return script_dir.parent / "data"
-    except NameError:
-        # Running interactively (e.g., Jupyter, REPL)
-        return Path.cwd() / "data"
+    ordered = sorted(repos, key=lambda repo: repo["name"])
+    return hashlib.blake2b(
+        orjson.dumps(ordered, option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
 
 
 def save_to_csv(repos: List[Dict], filename: str = "dsci_532_repos.csv"):
     """
     Save the list of repositories to a CSV file.
 
+    A Parquet copy is written next to it for the later scripts to load.
+
     Args:
         repos: List of repository dictionaries
         filename: Output CSV filename (can be relative or absolute path)
@@ -141,15 +212,18 @@ def save_to_csv(repos: List[Dict], filename: str = "dsci_532_repos.csv"):
         "full_name",
         "html_url",
         "description",
+        "website_url",
         "created_at",
         "updated_at",
+        "pushed_at",
         "private",
+        "default_branch",
+        "default_branch_sha",
+        "sketch_oid",
+        "sketch_size",
     ]
 
-    with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(repos)
+    save_repos(pd.DataFrame(repos, columns=fieldnames), filename)
 
     print(f"Successfully saved {len(repos)} repositories to {filename}")
 
@@ -166,10 +240,22 @@ def main():
 
     if repos:
         # Save to data directory
-        data_dir = get_output_path()
+        data_dir = get_data_path()
         data_dir.mkdir(parents=True, exist_ok=True)
         output_path = data_dir / "dsci_532_repos.csv"
-        save_to_csv(repos, str(output_path))
+
+        # Leave the CSV (and the later scripts' results) alone if nothing changed
+        digest = hash_repos(repos)
+        unchanged = digest == read_repos_hash()
+        if unchanged and output_path.with_suffix(".parquet").exists():
+            print(f"Repository list unchanged; {output_path} is up to date")
+        else:
+            save_to_csv(repos, str(output_path))
+            get_repos_hash_path().write_text(digest)
+            # The fresh table lacks the later scripts' columns, even if the
+            # list itself (and so the digest) is unchanged
+            clear_later_stages("01-fetch_repos")
+
         print("\nRepository names:")
         for repo in repos:
             print(f"  - {repo['name']}")
@@ -1,100 +1,180 @@
-import pandas as pd
+import orjson
+import shutil
 import requests
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from tqdm import tqdm
-
-
-def get_output_path() -> Path:
-    """
-    Get the path to the data directory.
-
-    Works in both script and interactive modes by checking if __file__ is defined.
-    If running interactively, defaults to current working directory.
-
-    Returns:
-        Path to the data directory
-    """
-    try:
-        # Running as a script
-        script_dir = Path(__file__).parent
-        return script_dir.parent / "data"
-    except NameError:
-        # Running interactively (e.g., Jupyter, REPL)
-        return Path.cwd() / "data"
-
-
-def get_group_data_path() -> Path:
-    """
-    Get the path to the group_data directory.
-
-    Returns:
-        Path to the group_data directory
-    """
-    try:
-        # Running as a script
-        script_dir = Path(__file__).parent
-        return script_dir.parent / "group_data"
-    except NameError:
-        # Running interactively (e.g., Jupyter, REPL)
-        return Path.cwd() / "group_data"
+from _common import (
+    clear_later_stages,
+    get_data_path,
+    get_group_data_path,
+    get_session,
+    is_stage_current,
+    load_repos,
+    mark_stage_current,
+    save_repos,
+)
 
 
 def download_sketch(
-    repo_full_name: str, group_number: str, group_data_dir: Path
-) -> Optional[str]:
+    repo_full_name: str,
+    group_number: str,
+    group_data_dir: Path,
+    default_branch: str = "",
+    sketch_cache: Optional[Dict[str, Dict[str, str]]] = None,
+    sketch_oid: Optional[str] = None,
+    sketch_size: Optional[int] = None,
+    commit_sha: str = "",
+) -> Tuple[Optional[str], bool]:
     """
     Download sketch.png from a repository's img/ folder.
 
+    The sketch's git blob oid (from 01-fetch_repos.py) short-circuits the
+    download: an empty oid means the repo has no sketch, and an oid matching
+    the one cached for the local file means it is unchanged. Otherwise the
+    cached ETag is sent as If-None-Match so a 304 skips the body. A local
+    file with nothing cached is kept if its size matches the upstream size
+    (from the scan, or a HEAD request if unknown).
+
+    The sketch is fetched from the commit the scan saw, since branch URLs on
+    raw.githubusercontent.com are cached for a few minutes and may still
+    serve the previous sketch right after a push. Without a commit the oid
+    isn't recorded, as the bytes may not match it.
+
     Args:
         repo_full_name: Full repository name (e.g., "UBC-MDS/DSCI-532_2026_12_my-project")
         group_number: Group number for directory structure
         group_data_dir: Base directory for group data
+        default_branch: Repository default branch (if empty, tries main then master)
+        sketch_cache: Mapping of group number to {"etag", "oid"} of the
+            local sketch, updated in place
+        sketch_oid: Blob oid of img/sketch.png ("" if absent, None if unknown)
+        sketch_size: Size in bytes of img/sketch.png (None if unknown)
+        commit_sha: Default branch commit sketch_oid was read from
+            (if empty, falls back to the branch name)
 
     Returns:
-        Path to downloaded file if successful, None otherwise
+        (path, errored): path to the downloaded file, or None if there is
+        none; errored is True if a request failed, so a None path doesn't
+        mean the repo has no sketch
     """
+    if sketch_oid == "":
+        # The scan found no img/sketch.png in this repo
+        return None, False
+
+    if sketch_cache is None:
+        sketch_cache = {}
+
     # Create group directory
     group_dir = group_data_dir / str(group_number)
     group_dir.mkdir(parents=True, exist_ok=True)
 
-    # Construct raw GitHub URL (try main branch first)
-    branches = ["main", "master"]
+    # Save as sketch.png (each group has its own directory)
+    output_path = group_dir / "sketch.png"
+    relative_path = str(output_path.relative_to(group_data_dir.parent))
+
+    # Only trust the cache if we still have the file it refers to
+    cached = sketch_cache.get(str(group_number), {})
+    headers = {}
+    if output_path.exists():
+        if sketch_oid and cached.get("oid") == sketch_oid:
+            return relative_path, False
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+    # Nothing cached for an existing file (e.g. the cache was lost)
+    check_size = output_path.exists() and not cached
+
+    # Only an oid read from the commit we download from describes the bytes
+    known_oid = (sketch_oid or "") if commit_sha else ""
+
+    # Construct raw GitHub URL from the scanned commit, the default branch,
+    # or probe main then master
+    if commit_sha:
+        refs = [commit_sha]
+    elif default_branch:
+        refs = [default_branch]
+    else:
+        refs = ["main", "master"]
     file_path = "img/sketch.png"
+    errored = False
 
-    for branch in branches:
-        raw_url = f"https://raw.githubusercontent.com/{repo_full_name}/{branch}/{file_path}"
+    for ref in refs:
+        raw_url = f"https://raw.githubusercontent.com/{repo_full_name}/{ref}/{file_path}"
 
         try:
-            response = requests.get(raw_url, timeout=10)
-            if response.status_code == 200:
-                # Save as sketch.png (each group has its own directory)
-                output_filename = "sketch.png"
-                output_path = group_dir / output_filename
-
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-
-                # Return relative path from project root
-                return str(output_path.relative_to(group_data_dir.parent))
-
-        except requests.exceptions.RequestException as e:
-            # Try next branch
+            if check_size:
+                remote_size = sketch_size
+                if not remote_size:
+                    head = get_session().head(raw_url, timeout=(3.05, 10))
+                    if head.status_code != 200:
+                        errored |= head.status_code != 404
+                        continue
+                    remote_size = int(head.headers.get("Content-Length", -1))
+
+                if remote_size == output_path.stat().st_size:
+                    sketch_cache[str(group_number)] = {
+                        "etag": "",
+                        "oid": known_oid,
+                    }
+                    return relative_path, False
+
+            with get_session().get(
+                raw_url, headers=headers, stream=True, timeout=(3.05, 10)
+            ) as response:
+                if response.status_code == 304:
+                    # Unchanged since last download
+                    sketch_cache[str(group_number)] = {
+                        "etag": cached["etag"],
+                        "oid": known_oid,
+                    }
+                    return relative_path, False
+
+                if response.status_code == 200:
+                    # Stream to a temporary file so an interrupted download
+                    # never replaces a good sketch
+                    response.raw.decode_content = True
+                    tmp_path = output_path.with_suffix(".png.part")
+                    with open(tmp_path, "wb") as f:
+                        shutil.copyfileobj(response.raw, f, 64 * 1024)
+                    tmp_path.replace(output_path)
+
+                    sketch_cache[str(group_number)] = {
+                        "etag": response.headers.get("ETag", ""),
+                        "oid": known_oid,
+                    }
+
+                    # Return relative path from project root
+                    return relative_path, False
+
+                # 404 means no sketch at this ref; anything else is a failure
+                errored |= response.status_code != 404
+
+        except (requests.exceptions.RequestException, Urllib3HTTPError):
+            # Try next ref (reading response.raw raises urllib3 errors)
+            errored = True
             continue
 
-    return None
+    return None, errored
 
 
-def download_all_sketches(csv_path: str, output_csv: str = None):
+def download_all_sketches(
+    csv_path: str, output_csv: str = None, max_workers: int = 32
+):
     """
     Download sketch files for all repositories and update CSV with paths.
 
     Args:
         csv_path: Path to input CSV file
         output_csv: Path to output CSV file (if None, overwrites input_csv)
+        max_workers: Number of concurrent download threads
+
+    Returns:
+        (df, failures): the updated DataFrame and the number of repos whose
+        sketch couldn't be fetched because of an error
     """
-    # Read the CSV
-    df = pd.read_csv(csv_path)
+    df = load_repos(csv_path)
 
     print(f"Loaded {len(df)} repositories from {csv_path}")
 
@@ -102,61 +182,129 @@ def download_all_sketches(csv_path: str, output_csv: str = None):
     group_data_dir = get_group_data_path()
     group_data_dir.mkdir(parents=True, exist_ok=True)
 
-    # Download sketches for each repository
-    sketch_paths = []
-
-    print("\nDownloading sketch files...")
-    for idx, row in tqdm(
-        df.iterrows(), total=len(df), desc="Processing repos"
-    ):
-        repo_full_name = row["full_name"]
-        group_number = row["group_number"]
+    # Load ETags and blob oids of the sketches from previous runs
+    sketch_cache_path = group_data_dir / ".sketches.json"
+    sketch_cache = {}
+    if sketch_cache_path.exists():
+        sketch_cache = orjson.loads(sketch_cache_path.read_bytes())
+
+    # Download sketches for each repository concurrently
+    sketch_paths = [""] * len(df)
+    default_branches = (
+        df["default_branch"].fillna("").to_numpy()
+        if "default_branch" in df
+        else [""] * len(df)
+    )
+    commit_shas = (
+        df["default_branch_sha"].fillna("").to_numpy()
+        if "default_branch_sha" in df
+        else [""] * len(df)
+    )
+    # None (unknown) if the CSV predates the sketch_oid/sketch_size columns
+    sketch_oids = (
+        df["sketch_oid"].fillna("").to_numpy()
+        if "sketch_oid" in df
+        else [None] * len(df)
+    )
+    sketch_sizes = (
+        df["sketch_size"].fillna(0).to_numpy()
+        if "sketch_size" in df
+        else [None] * len(df)
+    )
 
-        if not group_number:
-            # Skip repos without group number
-            sketch_paths.append("")
-            continue
+    failures = 0
 
-        sketch_path = download_sketch(
-            repo_full_name, group_number, group_data_dir
+    print("\nDownloading sketch files...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for i, row in enumerate(df.itertuples(index=False)):
+            if not row.group_number:
+                # Skip repos without group number
+                continue
+
+            future = executor.submit(
+                download_sketch,
+                row.full_name,
+                row.group_number,
+                group_data_dir,
+                default_branches[i],
+                sketch_cache,
+                sketch_oids[i],
+                sketch_sizes[i],
+                commit_shas[i],
+            )
+            futures[future] = i
+
+        # Refresh the bar a few times a second rather than on every repo
+        for future in tqdm(
+            as_completed(futures),
+            total=len(futures),
+            desc="Processing repos",
+            mininterval=0.5,
+            miniters=max(1, len(futures) // 200),
+        ):
+            sketch_path, errored = future.result()
+            sketch_paths[futures[future]] = sketch_path if sketch_path else ""
+            failures += errored
+
+    # Persist the cache for the next run
+    sketch_cache_path.write_bytes(
+        orjson.dumps(
+            sketch_cache, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
         )
-
-        sketch_paths.append(sketch_path if sketch_path else "")
+    )
 
     # Add sketch_path column to dataframe
     df["sketch_path"] = sketch_paths
 
     # Save updated CSV
     output_path = output_csv if output_csv else csv_path
-    df.to_csv(output_path, index=False)
+    save_repos(df, output_path)
 
     # Print summary
     successful_downloads = sum(1 for path in sketch_paths if path)
     print(
         f"\nSuccessfully downloaded {successful_downloads}/{len(df)} sketch files"
     )
+    if failures:
+        print(f"Failed to fetch the sketch of {failures} repos")
     print(f"Updated CSV saved to {output_path}")
 
     # Show sample of downloaded files
     print("\nSample of downloaded files:")
     print(df[["name", "group_number", "sketch_path"]].head(10))
 
-    return df
+    return df, failures
 
 
 def main():
     """Main function to download sketch files."""
-    data_dir = get_output_path()
+    data_dir = get_data_path()
     input_file = data_dir / "dsci_532_repos.csv"
 
-    if not input_file.exists():
+    if not input_file.with_suffix(".parquet").exists():
         raise FileNotFoundError(
-            f"Input file not found: {input_file}\n"
+            f"Input file not found: {input_file.with_suffix('.parquet')}\n"
             "Please run 01-fetch_repos.py and 02-parse_repos.py first."
         )
 
+    if is_stage_current(
+        "03-download_sketches",
+        input_file.with_suffix(".parquet"),
+        get_group_data_path(),
+    ):
+        print("Repository list unchanged since the last run; up to date.")
+        return None
+
     print("Downloading sketch files from repositories...")
-    df = download_all_sketches(str(input_file))
+    df, failures = download_all_sketches(str(input_file))
+    # The table was rewritten, so the later scripts must run again
+    clear_later_stages("03-download_sketches")
+    # Re-run next time if some sketches were missed because of errors
+    if failures:
+        print("Some downloads failed; they will be retried on the next run.")
+    else:
+        mark_stage_current("03-download_sketches")
 
     return df
 
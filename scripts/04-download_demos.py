@@ -1,10 +1,31 @@
+import multiprocessing
+import shutil
 import subprocess
-import tempfile
-import pandas as pd
 import requests
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 from tqdm import tqdm
+from _common import (
+    clear_later_stages,
+    get_data_path,
+    get_group_data_path,
+    get_session,
+    is_stage_current,
+    load_repos,
+    mark_stage_current,
+    save_repos,
+)
+from _gif import process_gif
+
+
+# Downloaded but not yet normalized demos (see download_demo)
+PENDING_NAME = "demo.pending.gif"
 
 
 def mp4_to_gif(mp4_path: Path, gif_path: Path) -> bool:
@@ -35,46 +56,40 @@ def mp4_to_gif(mp4_path: Path, gif_path: Path) -> bool:
         return False
 
 
-def get_output_path() -> Path:
-    try:
-        script_dir = Path(__file__).parent
-        return script_dir.parent / "data"
-    except NameError:
-        return Path.cwd() / "data"
-
-
-def get_group_data_path() -> Path:
-    try:
-        script_dir = Path(__file__).parent
-        return script_dir.parent / "group_data"
-    except NameError:
-        return Path.cwd() / "group_data"
-
-
 def download_demo(
     repo_full_name: str, group_number: str, group_data_dir: Path
-) -> Optional[str]:
+) -> Tuple[Optional[str], bool]:
     """
     Download demo.gif from a repository's img/ folder.
 
+    The download is saved as demo.pending.gif; download_all_demos renames it
+    to demo.gif once it has been normalized, so demo.gif is always a
+    normalized demo. A pending file left by an earlier run is returned
+    as-is so its normalization is retried.
+
     Args:
         repo_full_name: Full repository name (e.g., "UBC-MDS/DSCI-532_2026_12_my-project")
         group_number: Group number for directory structure
         group_data_dir: Base directory for group data
 
     Returns:
-        Path to downloaded file if successful, None otherwise
+        (path, errored): path to demo.gif or demo.pending.gif, or None if
+        there is none; errored is True if a request or the MP4 conversion
+        failed, so a None path doesn't mean the repo has no demo
     """
     group_dir = group_data_dir / str(group_number)
     group_dir.mkdir(parents=True, exist_ok=True)
 
-    output_path = group_dir / "demo.gif"
+    # If already downloaded (and normalized, or waiting to be), return it
+    for existing_path in [group_dir / "demo.gif", group_dir / PENDING_NAME]:
+        if existing_path.exists():
+            return str(existing_path.relative_to(group_data_dir.parent)), False
 
-    # If already downloaded, return the existing path
-    if output_path.exists():
-        return str(output_path.relative_to(group_data_dir.parent))
+    output_path = group_dir / PENDING_NAME
+    relative_path = str(output_path.relative_to(group_data_dir.parent))
 
     branches = ["main", "master"]
+    errored = False
 
     # Try GIF first, then MP4
     for file_path in ["img/demo.gif", "img/demo.mp4"]:
@@ -82,89 +97,192 @@ def download_demo(
             raw_url = f"https://raw.githubusercontent.com/{repo_full_name}/{branch}/{file_path}"
 
             try:
-                response = requests.get(raw_url, timeout=30)
-                if response.status_code != 200:
-                    continue
+                with get_session().get(
+                    raw_url, stream=True, timeout=(3.05, 30)
+                ) as response:
+                    if response.status_code != 200:
+                        # 404 means no demo here; anything else is a failure
+                        errored |= response.status_code != 404
+                        continue
+                    response.raw.decode_content = True
+
+                    if file_path.endswith(".gif"):
+                        # Stream to a temporary file so an interrupted
+                        # download never leaves a truncated demo.gif
+                        tmp_path = output_path.with_suffix(".gif.part")
+                        with open(tmp_path, "wb") as f:
+                            shutil.copyfileobj(response.raw, f, 64 * 1024)
+                        tmp_path.replace(output_path)
+                        return relative_path, False
 
-                if file_path.endswith(".gif"):
-                    with open(output_path, "wb") as f:
-                        f.write(response.content)
-                    return str(output_path.relative_to(group_data_dir.parent))
-
-                else:
                     # Write MP4 to a temp file and convert to GIF
-                    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-                        tmp.write(response.content)
-                        tmp_path = Path(tmp.name)
-                    try:
-                        if mp4_to_gif(tmp_path, output_path):
-                            return str(output_path.relative_to(group_data_dir.parent))
-                    finally:
-                        tmp_path.unlink(missing_ok=True)
-
-            except requests.exceptions.RequestException:
+                    tmp_path = output_path.with_suffix(".mp4.part")
+                    with open(tmp_path, "wb") as f:
+                        shutil.copyfileobj(response.raw, f, 64 * 1024)
+
+                # ffmpeg picks the format from the extension, so keep ".gif"
+                gif_tmp_path = output_path.with_suffix(".part.gif")
+                try:
+                    if mp4_to_gif(tmp_path, gif_tmp_path):
+                        gif_tmp_path.replace(output_path)
+                        return relative_path, False
+                    errored = True
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+                    gif_tmp_path.unlink(missing_ok=True)
+
+            except (requests.exceptions.RequestException, Urllib3HTTPError):
+                # Try next branch (reading response.raw raises urllib3 errors)
+                errored = True
                 continue
 
-    return None
+    return None, errored
 
 
-def download_all_demos(csv_path: str, output_csv: str = None):
+def download_all_demos(
+    csv_path: str, output_csv: str = None, max_workers: int = 8
+):
     """
     Download demo.gif files for all repositories and update CSV with paths.
 
+    Newly downloaded GIFs are normalized in a process pool as soon as each
+    download finishes, overlapping the CPU-bound image work with the
+    remaining downloads. A repo's demo_path is only set once its demo.gif
+    is normalized.
+
     Args:
         csv_path: Path to input CSV file
         output_csv: Path to output CSV file (if None, overwrites input_csv)
+        max_workers: Number of concurrent downloads (each may run ffmpeg)
+
+    Returns:
+        (df, failures): the updated DataFrame and the number of repos whose
+        demo couldn't be downloaded or normalized because of an error
     """
-    df = pd.read_csv(csv_path)
+    df = load_repos(csv_path)
 
     print(f"Loaded {len(df)} repositories from {csv_path}")
 
     group_data_dir = get_group_data_path()
     group_data_dir.mkdir(parents=True, exist_ok=True)
 
-    demo_paths = []
+    demo_paths = [""] * len(df)
+    normalize_futures = {}
+    failures = 0
 
     print("\nDownloading demo files...")
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing repos"):
-        repo_full_name = row["full_name"]
-        group_number = row["group_number"]
+    # Forking while the download threads run can deadlock the children
+    # (e.g. on a lock held by another thread), so start workers fresh
+    normalize_executor = ProcessPoolExecutor(
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for i, row in enumerate(df.itertuples(index=False)):
+            if not row.group_number:
+                continue
 
-        if not group_number:
-            demo_paths.append("")
-            continue
+            future = executor.submit(
+                download_demo, row.full_name, row.group_number, group_data_dir
+            )
+            futures[future] = i
+
+        for future in tqdm(
+            as_completed(futures),
+            total=len(futures),
+            desc="Processing repos",
+            mininterval=0.5,
+            miniters=max(1, len(futures) // 200),
+        ):
+            i = futures[future]
+            demo_path, errored = future.result()
+            failures += errored
+            if not demo_path:
+                continue
 
-        demo_path = download_demo(repo_full_name, group_number, group_data_dir)
-        demo_paths.append(demo_path if demo_path else "")
+            pending_path = group_data_dir.parent / demo_path
+            if pending_path.name != PENDING_NAME:
+                demo_paths[i] = demo_path
+                continue
+
+            # Normalize into a temporary file, renamed to demo.gif on success
+            normalize_future = normalize_executor.submit(
+                process_gif,
+                pending_path,
+                pending_path.with_name("demo.gif.part"),
+            )
+            normalize_futures[normalize_future] = (i, pending_path)
+
+    # Collect the normalizations still running after the last download
+    normalized = 0
+    with normalize_executor:
+        for normalize_future in as_completed(normalize_futures):
+            i, pending_path = normalize_futures[normalize_future]
+            gif_path = pending_path.with_name("demo.gif")
+            demo_path = str(gif_path.relative_to(group_data_dir.parent))
+            try:
+                before, after = normalize_future.result()
+            except Exception as e:
+                # Keep the pending file so the next run retries it
+                print(f"  {demo_path} — ERROR: {e}")
+                failures += 1
+                continue
+
+            pending_path.with_name("demo.gif.part").replace(gif_path)
+            pending_path.unlink()
+            demo_paths[i] = demo_path
+            normalized += 1
+            print(
+                f"  {demo_path} — "
+                f"{before / 1_000_000:.1f}MB → {after / 1_000_000:.1f}MB"
+            )
 
     df["demo_path"] = demo_paths
 
     output_path = output_csv if output_csv else csv_path
-    df.to_csv(output_path, index=False)
+    save_repos(df, output_path)
 
     successful_downloads = sum(1 for path in demo_paths if path)
     print(f"\nSuccessfully downloaded {successful_downloads}/{len(df)} demo files")
+    print(f"Normalized {normalized}/{len(normalize_futures)} new demo files")
+    if failures:
+        print(f"Failed to fetch or normalize the demo of {failures} repos")
     print(f"Updated CSV saved to {output_path}")
 
     print("\nSample of downloaded files:")
     print(df[["name", "group_number", "demo_path"]].head(10))
 
-    return df
+    return df, failures
 
 
 def main():
     """Main function to download demo files."""
-    data_dir = get_output_path()
+    data_dir = get_data_path()
     input_file = data_dir / "dsci_532_repos.csv"
 
-    if not input_file.exists():
+    if not input_file.with_suffix(".parquet").exists():
         raise FileNotFoundError(
-            f"Input file not found: {input_file}\n"
+            f"Input file not found: {input_file.with_suffix('.parquet')}\n"
             "Please run 01-fetch_repos.py and 02-parse_repos.py first."
         )
 
+    if is_stage_current(
+        "04-download_demos",
+        input_file.with_suffix(".parquet"),
+        get_group_data_path(),
+    ):
+        print("Repository list unchanged since the last run; up to date.")
+        return None
+
     print("Downloading demo files from repositories...")
-    df = download_all_demos(str(input_file))
+    df, failures = download_all_demos(str(input_file))
+    # The table was rewritten, so the later scripts must run again
+    clear_later_stages("04-download_demos")
+    # Re-run next time if some demos were missed because of errors
+    if failures:
+        print("Some demos failed; they will be retried on the next run.")
+    else:
+        mark_stage_current("04-download_demos")
 
     return df
 
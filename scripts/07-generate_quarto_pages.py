@@ -1,43 +1,38 @@
+import string
+import numpy as np
 import pandas as pd
+import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Tuple
+from _common import (
+    get_data_path,
+    get_projects_path,
+    is_stage_current,
+    load_repos,
+    mark_stage_current,
+)
+
+
+# Project page: YAML frontmatter read by the listing, then the images
+PAGE_TEMPLATE = string.Template(
+    """---
+title: "Group $group_number"
+subtitle: "$project_name"
+description: "$description"
+repo: "$repo"
+dashboard: $dashboard
+image: $image
+order: $order
+---
 
+$body"""
+)
+DEMO_SECTION = string.Template("## Demo\n\n![Demo](../$path)\n")
+SKETCH_SECTION = string.Template("## Sketch\n\n![Sketch](../$path)\n")
 
-def get_output_path() -> Path:
-    """
-    Get the path to the data directory.
-
-    Works in both script and interactive modes by checking if __file__ is defined.
-    If running interactively, defaults to current working directory.
-
-    Returns:
-        Path to the data directory
-    """
-    try:
-        # Running as a script
-        script_dir = Path(__file__).parent
-        return script_dir.parent / "data"
-    except NameError:
-        # Running interactively (e.g., Jupyter, REPL)
-        return Path.cwd() / "data"
-
-
-def get_projects_path() -> Path:
-    """
-    Get the path to the projects directory for Quarto listing.
 
-    Returns:
-        Path to the projects directory
-    """
-    try:
-        # Running as a script
-        script_dir = Path(__file__).parent
-        return script_dir.parent / "projects"
-    except NameError:
-        # Running interactively (e.g., Jupyter, REPL)
-        return Path.cwd() / "projects"
-
-
-def create_project_page(
+def build_project_page(
     group_number: str,
     project_name: str,
     html_url: str,
@@ -47,9 +42,12 @@ def create_project_page(
     demo_path: str,
     projects_dir: Path,
     sort_order: int,
-) -> None:
+) -> Tuple[Path, Dict, str]:
     """
-    Create a Quarto markdown file for a project.
+    Build the listing entry and Quarto markdown page for a project.
+
+    Nothing is written here so that all pages can be written in one pass.
+    Text arguments are plain strings, with "" for missing values.
 
     Args:
         group_number: Group number
@@ -61,66 +59,93 @@ def create_project_page(
         demo_path: Path to demo gif
         projects_dir: Directory to save project pages
         sort_order: Numeric order for sorting (group number or high value for non-numeric)
+
+    Returns:
+        Tuple of (page filepath, listing entry, page content)
     """
     # Create filename from group number
     filename = f"group-{group_number}.qmd"
     filepath = projects_dir / filename
 
     # Use demo path if available, fall back to sketch, then placeholder
-    if demo_path and pd.notna(demo_path):
-        image_path = f"../{demo_path}"
-    elif sketch_path and pd.notna(sketch_path):
-        image_path = f"../{sketch_path}"
+    # (listing paths are relative to the project root, page paths to projects/)
+    if demo_path:
+        listing_image = demo_path
+    elif sketch_path:
+        listing_image = sketch_path
     else:
-        image_path = "https://via.placeholder.com/400x300?text=No+Image"
-
-    # Clean description
-    clean_description = (
-        description if description and pd.notna(description) else ""
+        listing_image = "https://via.placeholder.com/400x300?text=No+Image"
+    image_path = (
+        listing_image
+        if listing_image.startswith("https://")
+        else f"../{listing_image}"
     )
 
     # dashboard and repo as separate fields
-    dashboard_field = (
-        f'"{website_url}"' if website_url and pd.notna(website_url) else '""'
-    )
+    dashboard_field = f'"{website_url}"'
 
     # Build image sections for page body
-    body_lines = []
-    if demo_path and pd.notna(demo_path):
-        body_lines.append("## Demo\n")
-        body_lines.append(f"![Demo](../{demo_path})\n")
-    if sketch_path and pd.notna(sketch_path):
-        body_lines.append("## Sketch\n")
-        body_lines.append(f"![Sketch](../{sketch_path})\n")
-    body = "\n".join(body_lines) if body_lines else ""
-
-    # Create YAML frontmatter and minimal content
-    content = f"""---
-title: "Group {group_number}"
-subtitle: "{project_name}"
-description: "{clean_description}"
-repo: "{html_url}"
-dashboard: {dashboard_field}
-image: {image_path}
-order: {sort_order}
----
+    demo_section = (
+        DEMO_SECTION.substitute(path=demo_path) if demo_path else ""
+    )
+    sketch_section = (
+        SKETCH_SECTION.substitute(path=sketch_path) if sketch_path else ""
+    )
+    if demo_section and sketch_section:
+        sketch_section = "\n" + sketch_section
+
+    # Fill in YAML frontmatter and minimal content
+    content = PAGE_TEMPLATE.substitute(
+        group_number=group_number,
+        project_name=project_name,
+        description=description,
+        repo=html_url,
+        dashboard=dashboard_field,
+        image=image_path,
+        order=sort_order,
+        body=demo_section + sketch_section,
+    )
+
+    # Listing entry linking to the rendered page
+    entry = {
+        "title": f"Group {group_number}",
+        "subtitle": project_name,
+        "description": description,
+        "repo": html_url,
+        "dashboard": website_url,
+        "image": listing_image,
+        "order": sort_order,
+        "path": f"{projects_dir.name}/{filepath.stem}.html",
+    }
+
+    return filepath, entry, content
 
-{body}"""
 
-    # Write to file
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(content)
+def get_text_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    """
+    Get a text column as an array with missing values replaced by "".
 
+    Args:
+        df: DataFrame to read from
+        column: Column name (may be absent if an earlier script was skipped)
 
-def generate_all_pages(csv_path: str) -> None:
+    Returns:
+        Object array of strings, one per row
+    """
+    if column not in df:
+        return np.full(len(df), "", dtype=object)
+    return df[column].fillna("").to_numpy(dtype=object)
+
+
+def generate_all_pages(csv_path: str, max_workers: int = 16) -> None:
     """
     Generate Quarto pages for all projects in the CSV.
 
     Args:
         csv_path: Path to input CSV file
+        max_workers: Number of threads used to write the page files
     """
-    # Read the CSV
-    df = pd.read_csv(csv_path)
+    df = load_repos(csv_path)
 
     print(f"Loaded {len(df)} repositories from {csv_path}")
 
@@ -128,133 +153,126 @@ def generate_all_pages(csv_path: str) -> None:
     projects_dir = get_projects_path()
     projects_dir.mkdir(parents=True, exist_ok=True)
 
-    # Generate page for each project
-    pages_created = 0
+    # Pull each column out once instead of boxing every row into a Series
+    group_numbers = df["group_number"].to_numpy(dtype=object)
+    has_group = (
+        df["group_number"].notna() & (df["group_number"].astype(str) != "")
+    ).to_numpy()
+    # Classify numeric vs non-numeric group numbers in one vectorized call
+    numeric_groups = pd.to_numeric(df["group_number"], errors="coerce")
+    is_numeric = numeric_groups.notna().to_numpy()
+    group_ints = numeric_groups.fillna(0).astype(int).to_numpy()
+    project_names = get_text_column(df, "project_name")
+    html_urls = get_text_column(df, "html_url")
+    website_urls = get_text_column(df, "website_url")
+    descriptions = get_text_column(df, "description")
+    sketch_paths = get_text_column(df, "sketch_path")
+    demo_paths = get_text_column(df, "demo_path")
+
+    # Collect the arguments for each page, then build and write them at the end
+    page_args = []
     non_numeric_groups = []
 
     # First pass: process numeric groups
-    for idx, row in df.iterrows():
-        group_number = row["group_number"]
-
+    for i in range(len(df)):
         # Skip if no group number
-        if not group_number or pd.isna(group_number):
+        if not has_group[i]:
             continue
 
-        # Check if group_number is numeric
-        try:
-            group_num_int = int(float(group_number))
-            group_num_str = str(group_num_int)
-            sort_order = group_num_int
-        except (ValueError, TypeError):
+        if not is_numeric[i]:
             # Save non-numeric groups for later
-            non_numeric_groups.append((group_number, row))
+            non_numeric_groups.append((str(group_numbers[i]), i))
             continue
 
-        project_name = (
-            row["project_name"] if pd.notna(row["project_name"]) else ""
-        )
-        html_url = row["html_url"]
-        website_url = (
-            row["website_url"]
-            if "website_url" in row and pd.notna(row["website_url"])
-            else ""
-        )
-        description = (
-            row["description"] if pd.notna(row["description"]) else ""
-        )
-        sketch_path = (
-            row["sketch_path"]
-            if "sketch_path" in row and pd.notna(row["sketch_path"])
-            else ""
-        )
-        demo_path = (
-            row["demo_path"]
-            if "demo_path" in row and pd.notna(row["demo_path"])
-            else ""
-        )
+        sort_order = int(group_ints[i])
 
-        create_project_page(
-            group_num_str,
-            project_name,
-            html_url,
-            website_url,
-            description,
-            sketch_path,
-            demo_path,
+        page_args.append((
+            str(sort_order),
+            project_names[i],
+            html_urls[i],
+            website_urls[i],
+            descriptions[i],
+            sketch_paths[i],
+            demo_paths[i],
             projects_dir,
             sort_order,
-        )
-
-        pages_created += 1
+        ))
 
     # Second pass: process non-numeric groups (alphabetically at the end)
     # Sort non-numeric groups alphabetically
     non_numeric_groups.sort(key=lambda x: x[0])
 
-    for idx, (group_number, row) in enumerate(non_numeric_groups):
+    for idx, (group_number, i) in enumerate(non_numeric_groups):
         # Assign high sort order (9000+) to put at end, with alphabetical ordering
         sort_order = 9000 + idx
 
-        project_name = (
-            row["project_name"] if pd.notna(row["project_name"]) else ""
-        )
-        html_url = row["html_url"]
-        website_url = (
-            row["website_url"]
-            if "website_url" in row and pd.notna(row["website_url"])
-            else ""
-        )
-        description = (
-            row["description"] if pd.notna(row["description"]) else ""
-        )
-        sketch_path = (
-            row["sketch_path"]
-            if "sketch_path" in row and pd.notna(row["sketch_path"])
-            else ""
-        )
-        demo_path = (
-            row["demo_path"]
-            if "demo_path" in row and pd.notna(row["demo_path"])
-            else ""
-        )
-
-        create_project_page(
-            str(group_number),
-            project_name,
-            html_url,
-            website_url,
-            description,
-            sketch_path,
-            demo_path,
+        page_args.append((
+            group_number,
+            project_names[i],
+            html_urls[i],
+            website_urls[i],
+            descriptions[i],
+            sketch_paths[i],
+            demo_paths[i],
             projects_dir,
             sort_order,
-        )
-
-        pages_created += 1
+        ))
         print(
             f"Created page for non-numeric group '{group_number}' with sort order {sort_order}"
         )
 
+    pages = [build_project_page(*args) for args in page_args]
+
+    # The home page listing reads every entry from a single YAML file
+    listing_path = projects_dir.parent / "_projects.yml"
+    with open(listing_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(
+            [entry for _, entry, _ in pages],
+            f,
+            sort_keys=False,
+            allow_unicode=True,
+        )
+
+    # Individual pages are kept for deep links; writes are independent
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(
+            executor.map(
+                lambda page: page[0].write_text(page[2], encoding="utf-8"),
+                pages,
+            )
+        )
+
     print(
-        f"\nSuccessfully created {pages_created} project pages in {projects_dir}"
+        f"\nSuccessfully created {len(pages)} project pages in {projects_dir}"
     )
+    print(f"Listing entries saved to {listing_path}")
     print("\nTo build the website, run:")
     print("  quarto render")
 
 
 def main():
     """Main function to generate Quarto project pages."""
-    data_dir = get_output_path()
+    data_dir = get_data_path()
     input_file = data_dir / "dsci_532_repos.csv"
 
-    if not input_file.exists():
+    if not input_file.with_suffix(".parquet").exists():
         raise FileNotFoundError(
-            f"Input file not found: {input_file}\n"
-            "Please run 01- through 05- scripts first."
+            f"Input file not found: {input_file.with_suffix('.parquet')}\n"
+            "Please run scripts 01- through 04- first."
         )
 
+    projects_dir = get_projects_path()
+    if is_stage_current(
+        "07-generate_quarto_pages",
+        projects_dir,
+        projects_dir.parent / "_projects.yml",
+    ):
+        print("Repository list unchanged since the last run; up to date.")
+        return
+
     print("Generating Quarto project pages...")
     generate_all_pages(str(input_file))
+    mark_stage_current("07-generate_quarto_pages")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,243 @@
+"""Helpers shared by the numbered pipeline scripts."""
+
+import functools
+import os
+import threading
+from getpass import getpass
+from pathlib import Path
+
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Project root (the scripts live in <root>/scripts)
+ROOT_DIR = Path(__file__).parent.parent
+
+
+@functools.lru_cache(maxsize=1)
+def get_data_path() -> Path:
+    """
+    Get the path to the data directory.
+
+    Returns:
+        Path to the data directory
+    """
+    return ROOT_DIR / "data"
+
+
+@functools.lru_cache(maxsize=1)
+def get_group_data_path() -> Path:
+    """
+    Get the path to the group_data directory.
+
+    Returns:
+        Path to the group_data directory
+    """
+    return ROOT_DIR / "group_data"
+
+
+@functools.lru_cache(maxsize=1)
+def get_projects_path() -> Path:
+    """
+    Get the path to the projects directory for Quarto listing.
+
+    Returns:
+        Path to the projects directory
+    """
+    return ROOT_DIR / "projects"
+
+
+# Scripts that write the repository table or a stage stamp, in pipeline
+# order (01-fetch_repos.py writes data/.repos.hash instead of a stamp)
+PIPELINE_STAGES = [
+    "01-fetch_repos",
+    "02-parse_repos",
+    "03-download_sketches",
+    "04-download_demos",
+    "07-generate_quarto_pages",
+]
+
+
+# One requests.Session per worker thread so connections are reused (keep-alive)
+_thread_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    Get the requests.Session for the current thread, creating it if needed.
+
+    The session retries transient failures (rate limiting and gateway errors)
+    with exponential backoff.
+
+    Returns:
+        Thread-local requests.Session
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        retry = Retry(
+            total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504]
+        )
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        _thread_local.session = session
+    return session
+
+
+def get_github_token() -> str:
+    """
+    Get GitHub Personal Access Token.
+
+    Checks in order:
+    1. Environment variables (GITHUB_TOKEN or GITHUB_PAT)
+    2. .env file (GITHUB_TOKEN or GITHUB_PAT)
+    3. Prompts user for input
+
+    Returns:
+        GitHub Personal Access Token
+    """
+    # Check environment variables first (for CI/CD)
+    token = os.getenv("GITHUB_TOKEN", "").strip()
+
+    # If not found, check GITHUB_PAT
+    if not token:
+        token = os.getenv("GITHUB_PAT", "").strip()
+
+    # If still not found, load from .env file
+    if not token:
+        load_dotenv()
+        token = os.getenv("GITHUB_TOKEN", "").strip()
+
+    # If still not found, check GITHUB_PAT from .env
+    if not token:
+        token = os.getenv("GITHUB_PAT", "").strip()
+
+    # Finally, prompt user if still empty
+    if not token:
+        token = getpass(
+            "Enter your GitHub Personal Access Token (press Enter to skip): "
+        ).strip()
+
+    if not token:
+        raise ValueError(
+            "No GitHub token provided. Please provide a token via environment variable, .env file, or prompt."
+        )
+
+    return token
+
+
+def load_repos(csv_path: str) -> pd.DataFrame:
+    """
+    Load the repository table saved by save_repos.
+
+    Reads the Parquet copy next to the CSV, which keeps column types and
+    avoids re-parsing text.
+
+    Args:
+        csv_path: Path to the CSV file
+
+    Returns:
+        DataFrame of repositories
+    """
+    return pd.read_parquet(Path(csv_path).with_suffix(".parquet"))
+
+
+def save_repos(df: pd.DataFrame, csv_path: str) -> None:
+    """
+    Save the repository table as CSV (for inspection) and Parquet.
+
+    Args:
+        df: DataFrame of repositories
+        csv_path: Path to the CSV file; the Parquet file uses the same stem
+    """
+    df.to_csv(csv_path, index=False)
+    df.to_parquet(
+        Path(csv_path).with_suffix(".parquet"),
+        engine="pyarrow",
+        compression="zstd",
+        index=False,
+    )
+
+
+def get_repos_hash_path() -> Path:
+    """
+    Get the path to the digest of the repository list written by 01-fetch_repos.py.
+
+    Returns:
+        Path to the hash file
+    """
+    return get_data_path() / ".repos.hash"
+
+
+def read_repos_hash() -> str:
+    """
+    Read the digest of the last fetched repository list.
+
+    Returns:
+        Hex digest, or "" if the repositories haven't been fetched yet
+    """
+    hash_path = get_repos_hash_path()
+    return hash_path.read_text().strip() if hash_path.exists() else ""
+
+
+def get_stage_hash_path(stage: str) -> Path:
+    """
+    Get the path to the stamp mark_stage_current writes for a script.
+
+    Args:
+        stage: Name of the script (e.g., "03-download_sketches")
+
+    Returns:
+        Path to the stage's hash file
+    """
+    return get_data_path() / f".{stage}.hash"
+
+
+def is_stage_current(stage: str, *outputs: Path) -> bool:
+    """
+    Check whether a script already ran on the current repository list.
+
+    Args:
+        stage: Name of the script (e.g., "03-download_sketches")
+        outputs: Files or directories the script produces
+
+    Returns:
+        True if the repository list is unchanged since the script last
+        completed and all its outputs still exist
+    """
+    repos_hash = read_repos_hash()
+    stage_path = get_stage_hash_path(stage)
+    if not repos_hash or not stage_path.exists():
+        return False
+    if stage_path.read_text().strip() != repos_hash:
+        return False
+    return all(output.exists() for output in outputs)
+
+
+def mark_stage_current(stage: str) -> None:
+    """
+    Record that a script completed on the current repository list.
+
+    Args:
+        stage: Name of the script (e.g., "03-download_sketches")
+    """
+    get_stage_hash_path(stage).write_text(read_repos_hash())
+
+
+def clear_later_stages(stage: str) -> None:
+    """
+    Remove the stamps of the scripts that run after a script.
+
+    Called whenever a script rewrites the repository table, so the later
+    scripts pick up its changes even though the repository list (and so
+    read_repos_hash) is the same.
+
+    Args:
+        stage: Name of the script that rewrote the table
+            (e.g., "03-download_sketches")
+    """
+    later = PIPELINE_STAGES[PIPELINE_STAGES.index(stage) + 1:]
+    for later_stage in later:
+        get_stage_hash_path(later_stage).unlink(missing_ok=True)
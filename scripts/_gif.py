@@ -0,0 +1,75 @@
+"""GIF normalization run in worker processes by 04-download_demos.py."""
+
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+
+def process_gif(
+    gif_path: Path,
+    output_path: Optional[Path] = None,
+    max_duration_ms: int = 1000,
+    max_width: int = 800,
+    max_colors: int = 128,
+) -> tuple[int, int]:
+    """
+    Process a GIF in a single pass:
+      - Resize frames to max_width (preserving aspect ratio)
+      - Reduce color palette to max_colors
+      - Scale frame durations so total playback <= max_duration_ms
+
+    The result is written to output_path (default: gif_path, in place).
+
+    Returns (original_bytes, new_bytes).
+    """
+    if output_path is None:
+        output_path = gif_path
+    original_size = gif_path.stat().st_size
+
+    img = Image.open(gif_path)
+    frames = []
+    durations = []
+
+    try:
+        while True:
+            durations.append(img.info.get("duration", 100))
+            frame = img.copy().convert("RGBA")
+
+            # Resize if wider than max_width
+            if frame.width > max_width:
+                ratio = max_width / frame.width
+                frame = frame.resize(
+                    (max_width, int(frame.height * ratio)), Image.LANCZOS
+                )
+
+            frames.append(frame)
+            img.seek(img.tell() + 1)
+    except EOFError:
+        pass
+
+    # Scale durations to fit within max_duration_ms
+    total = sum(durations)
+    if total > max_duration_ms:
+        scale = max_duration_ms / total
+        durations = [max(10, int(d * scale)) for d in durations]
+
+    # Quantize each frame to reduce palette size (FASTOCTREE supports RGBA)
+    palette_frames = [
+        f.quantize(colors=max_colors, method=Image.Quantize.FASTOCTREE)
+        for f in frames
+    ]
+
+    # Explicit format so output_path may be a temporary name (e.g. *.part)
+    palette_frames[0].save(
+        output_path,
+        format="GIF",
+        save_all=True,
+        append_images=palette_frames[1:],
+        loop=0,
+        duration=durations,
+        optimize=True,
+    )
+
+    new_size = output_path.stat().st_size
+    return original_size, new_size